@@ -0,0 +1,237 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, Tuple
+
+from PIL import Image
+
+from prelovium.utils.image_loading import decoded_size
+
+# Rough peak working set of prettify() per input pixel: the RGBA cut-out is
+# padded to ~2x the input area and the shadow/composite steps hold several
+# float64 3-channel temporaries (24 bytes per pixel each) at the same time.
+PRETTIFY_BYTES_PER_PIXEL = 256
+# Decoded uint8 RGB/RGBA images kept around for the rest of the request.
+DECODED_BYTES_PER_PIXEL = 4
+# An image as it comes out of the decoder, before it is downscaled: the decoded
+# buffer plus the exif_transpose() and convert("RGB") copies made from it.
+UNSCALED_BYTES_PER_PIXEL = 3 * DECODED_BYTES_PER_PIXEL
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted within the memory budget."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def image_header(source):
+    """
+    Read the format and (width, height) from the image header without
+    decoding the pixels.
+
+    Args:
+        source: File path or seekable file-like object
+
+    Returns:
+        Tuple of (format, (width, height)), e.g. ("JPEG", (4032, 3024))
+    """
+    position = source.tell() if hasattr(source, "tell") else None
+    try:
+        with Image.open(source) as image:
+            return image.format, image.size
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+def decoded_pixels(source, max_side: int) -> Tuple[int, int]:
+    """
+    Pixel counts of an image decoded with its longest side capped at max_side.
+
+    JPEGs are decoded reduced by a power of two (see image_loading.open_image);
+    every other format is decoded at full size before it is downscaled.
+
+    Returns:
+        Tuple of (pixels decoded before downscaling, pixels kept afterwards)
+    """
+    image_format, size = image_header(source)
+    width, height = decoded_size(image_format, size, max_side)
+    ratio = min(1.0, max_side / max(width, height))
+    return width * height, int(width * height * ratio * ratio)
+
+
+def estimate_request_cost(
+    prettify_sources: Iterable, plain_sources: Iterable, max_side: int
+) -> Tuple[int, int]:
+    """
+    Estimate the memory in bytes needed to process a /process request.
+
+    Images are decoded and prettify() calls run one after another, so only
+    the largest decode or composite counts towards the peak; every downscaled
+    image is held until the request ends.
+
+    Args:
+        prettify_sources: Images that go through prettify()
+        plain_sources: Images that are only decoded (e.g. the label)
+        max_side: Longest side inputs are decoded at
+
+    Returns:
+        Tuple of (peak bytes only needed while decoding and compositing,
+        bytes retained until the request ends)
+    """
+    prettify_pixels = [decoded_pixels(source, max_side) for source in prettify_sources]
+    plain_pixels = [decoded_pixels(source, max_side) for source in plain_sources]
+    peak = max(
+        max((kept for _, kept in prettify_pixels), default=0)
+        * PRETTIFY_BYTES_PER_PIXEL,
+        max((unscaled for unscaled, _ in prettify_pixels + plain_pixels), default=0)
+        * UNSCALED_BYTES_PER_PIXEL,
+    )
+    retained = (
+        sum(kept for _, kept in prettify_pixels + plain_pixels)
+        * DECODED_BYTES_PER_PIXEL
+    )
+    return peak, retained
+
+
+class Reservation:
+    """Bytes held against an AdmissionController's budget."""
+
+    def __init__(self, controller: "AdmissionController", cost: int, retained: int):
+        self._controller = controller
+        self._held = cost
+        self._retained = retained
+        self._released = False
+
+    def release_peak(self):
+        """Give back everything except the retained part once compositing ends."""
+        if self._released or self._held <= self._retained:
+            return
+        self._controller._return(self._held - self._retained, finished=False)
+        self._held = self._retained
+
+    def detach(self) -> "Reservation":
+        """Move the held bytes to a new reservation, e.g. for a background job.
+
+        This reservation becomes a no-op; the returned one must be released.
+        """
+        detached = Reservation(self._controller, self._held, self._retained)
+        self._released = True
+        return detached
+
+    def release(self):
+        """Give back the whole reservation. Safe to call more than once."""
+        if self._released:
+            return
+        self._released = True
+        self._controller._return(self._held, finished=True)
+
+
+class AdmissionController:
+    """Admit work against a memory budget with a bounded FIFO wait queue."""
+
+    def __init__(
+        self,
+        budget_bytes: int,
+        max_queue: int = 4,
+        queue_timeout: float = 60.0,
+        retry_after: int = 5,
+    ):
+        self.budget_bytes = budget_bytes
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self._condition = threading.Condition()
+        self._waiting = deque()
+        self._in_use_bytes = 0
+        self._active = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    def _fits(self, cost: int) -> bool:
+        return self._in_use_bytes + cost <= self.budget_bytes
+
+    def _acquire(self, cost: int):
+        with self._condition:
+            if not self._waiting and self._fits(cost):
+                self._take(cost)
+                return
+
+            if len(self._waiting) >= self.max_queue:
+                self._rejected += 1
+                raise AdmissionRejected("Admission queue is full", self.retry_after)
+
+            token = object()
+            self._waiting.append(token)
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while not (self._waiting[0] is token and self._fits(cost)):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timed_out += 1
+                        raise AdmissionRejected(
+                            "Timed out waiting for memory budget", self.retry_after
+                        )
+                    self._condition.wait(remaining)
+                self._take(cost)
+            finally:
+                self._waiting.remove(token)
+                self._condition.notify_all()
+
+    def _take(self, cost: int):
+        self._in_use_bytes += cost
+        self._active += 1
+        self._admitted += 1
+
+    def _return(self, cost: int, finished: bool):
+        with self._condition:
+            self._in_use_bytes -= cost
+            if finished:
+                self._active -= 1
+            self._condition.notify_all()
+
+    def acquire(self, cost: int, retained: int = 0) -> "Reservation":
+        """
+        Reserve ``cost`` bytes of the budget, waiting in the queue if needed.
+
+        Requests larger than the whole budget are clamped to it, so they run
+        alone instead of being refused outright.
+
+        Args:
+            cost: Total bytes needed at the request's peak
+            retained: Part of ``cost`` still needed after release_peak()
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait times out
+        """
+        cost = min(cost, self.budget_bytes)
+        self._acquire(cost)
+        return Reservation(self, cost, min(retained, cost))
+
+    @contextmanager
+    def admit(self, cost: int, retained: int = 0):
+        """Hold a reservation for the duration of the block."""
+        reservation = self.acquire(cost, retained)
+        try:
+            yield reservation
+        finally:
+            reservation.release()
+
+    def stats(self) -> Dict:
+        """Return a snapshot of budget usage and queue counters."""
+        with self._condition:
+            return {
+                "budget_bytes": self.budget_bytes,
+                "in_use_bytes": self._in_use_bytes,
+                "active": self._active,
+                "queued": len(self._waiting),
+                "max_queue": self.max_queue,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+            }
@@ -1,4 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
 from datetime import datetime
 import json
 
@@ -34,6 +36,9 @@ class Upload(db.Model):
     materials = db.Column(db.Text, nullable=False)  # JSON string
     categories = db.Column(db.Text, nullable=False)  # JSON string
     
+    # Resized/re-encoded copies of the processed images
+    derivatives = db.Column(db.Text, nullable=True)  # JSON string
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -60,11 +65,12 @@ class Upload(db.Model):
             'colors': json.loads(self.colors),
             'materials': json.loads(self.materials),
             'categories': json.loads(self.categories),
+            'derivatives': json.loads(self.derivatives) if self.derivatives else {},
             'created_at': self.created_at.isoformat()
         }
     
     @classmethod
-    def from_metadata(cls, upload_id, original_urls, processed_urls, metadata):
+    def from_metadata(cls, upload_id, original_urls, processed_urls, metadata, derivatives=None):
         """Create an Upload instance from metadata."""
         return cls(
             upload_id=upload_id,
@@ -82,5 +88,36 @@ class Upload(db.Model):
             size=metadata['size'],
             colors=json.dumps(metadata['colors']),
             materials=json.dumps(metadata['materials']),
-            categories=json.dumps(metadata['categories'])
-        )
\ No newline at end of file
+            categories=json.dumps(metadata['categories']),
+            derivatives=json.dumps(derivatives) if derivatives else None
+        )
+
+
+def add_missing_columns():
+    """Add nullable columns introduced after a table was first created.
+    
+    db.create_all() only creates missing tables, so existing databases would
+    otherwise lack newer columns. Several instances may start at once, so a
+    failed ALTER is ignored when the column exists afterwards.
+    """
+    preparer = db.engine.dialect.identifier_preparer
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            statement = (
+                f'ALTER TABLE {preparer.format_table(table)} '
+                f'ADD COLUMN {preparer.format_column(column)} {column_type}'
+            )
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(text(statement))
+            except DBAPIError:
+                current = inspect(db.engine).get_columns(table.name)
+                if column.name not in {c['name'] for c in current}:
+                    raise
@@ -0,0 +1,80 @@
+import cv2
+from typing import Dict, Iterable, List, Tuple
+
+# Encoder settings per output format: (file extension, MIME type, imencode params)
+FORMATS = {
+    "webp": (".webp", "image/webp", [cv2.IMWRITE_WEBP_QUALITY, 80]),
+    "jpeg": (".jpg", "image/jpeg", [cv2.IMWRITE_JPEG_QUALITY, 85]),
+}
+# AVIF encoding needs OpenCV 4.10+ built with libavif
+if hasattr(cv2, "IMWRITE_AVIF_QUALITY"):
+    FORMATS["avif"] = (".avif", "image/avif", [cv2.IMWRITE_AVIF_QUALITY, 60])
+
+
+def supported_formats(formats: Iterable[str]) -> List[str]:
+    """Filter formats down to those this OpenCV build can encode."""
+    supported = []
+    for image_format in formats:
+        if image_format not in FORMATS:
+            print(f"Derivative format not available: {image_format}")
+        elif not cv2.haveImageWriter(FORMATS[image_format][0]):
+            print(f"Derivative format not supported by OpenCV build: {image_format}")
+        else:
+            supported.append(image_format)
+    return supported
+
+
+def build_derivatives(
+    image, widths: Iterable[int], formats: Iterable[str]
+) -> List[Tuple[int, str, bytes]]:
+    """
+    Downscale an image to each target width and encode it in each format.
+
+    Widths at or above the image's own width are skipped, since they would
+    be no smaller than the full-size image.
+
+    Args:
+        image: BGR numpy array as used by OpenCV
+        widths: Target widths in pixels
+        formats: Keys of FORMATS to encode
+
+    Returns:
+        List of (width, format, encoded bytes)
+    """
+    height, width = image.shape[:2]
+    derivatives = []
+    for target_width in sorted(set(widths)):
+        if target_width >= width:
+            continue
+        target_height = round(height * target_width / width)
+        resized = cv2.resize(
+            image, (target_width, target_height), interpolation=cv2.INTER_AREA
+        )
+        for image_format in formats:
+            extension, _, params = FORMATS[image_format]
+            ok, buffer = cv2.imencode(extension, resized, params)
+            if not ok:
+                print(f"Failed to encode {image_format} derivative at {target_width}px")
+                continue
+            derivatives.append((target_width, image_format, buffer.tobytes()))
+    return derivatives
+
+
+def derivative_blob_name(
+    upload_id: str, image_type: str, width: int, image_format: str
+) -> str:
+    """Blob name for a derivative, next to the full-size processed image."""
+    extension = FORMATS[image_format][0]
+    return f"processed/{upload_id}/{image_type}_{width}w{extension}"
+
+
+def content_type(image_format: str) -> str:
+    return FORMATS[image_format][1]
+
+
+def srcset(urls_by_width: Dict) -> str:
+    """Render a {width: url} mapping as an HTML srcset attribute value."""
+    return ", ".join(
+        f"{url} {width}w"
+        for width, url in sorted(urls_by_width.items(), key=lambda item: int(item[0]))
+    )
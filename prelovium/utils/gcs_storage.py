@@ -1,13 +1,24 @@
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
 import os
 import tempfile
 import cv2
-from typing import Dict, Tuple
+from typing import Dict, Iterable, Iterator, Tuple
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from prelovium.utils.derivatives import (
+    build_derivatives,
+    content_type,
+    derivative_blob_name,
+)
+
 load_dotenv()
 
+# Blob names are unique per upload and never overwritten
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
 
 class GCSStorage:
     """Utility class for Google Cloud Storage operations."""
@@ -29,6 +40,7 @@ class GCSStorage:
             Public URL of the uploaded image
         """
         blob = self.bucket.blob(blob_name)
+        blob.cache_control = CACHE_CONTROL
 
         # If image_data is a file path, upload directly
         if isinstance(image_data, str) and os.path.exists(image_data):
@@ -36,9 +48,11 @@ class GCSStorage:
         else:
             # If it's numpy array (processed image), save to temp file first
             with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as temp_file:
-                cv2.imwrite(temp_file.name, image_data)
-                blob.upload_from_filename(temp_file.name)
-                os.unlink(temp_file.name)
+                try:
+                    cv2.imwrite(temp_file.name, image_data)
+                    blob.upload_from_filename(temp_file.name)
+                finally:
+                    os.unlink(temp_file.name)
 
         # Return the public URL - bucket is already configured for public read access via IAM
         return blob.public_url
@@ -65,32 +79,131 @@ class GCSStorage:
             blob_name = f"originals/{upload_id}/{image_type}.jpg"
             original_urls[image_type] = self.upload_image(file_path, blob_name)
 
-        # Upload processed images
+        # Upload processed images (RGB arrays, OpenCV writes BGR)
         for image_type, image_data in processed_images.items():
             blob_name = f"processed/{upload_id}/{image_type}.jpg"
+            image_data = cv2.cvtColor(image_data, cv2.COLOR_RGB2BGR)
             processed_urls[image_type] = self.upload_image(image_data, blob_name)
 
         return original_urls, processed_urls
 
-    def delete_images_for_upload(self, upload_id: str):
-        """Delete all images associated with an upload session."""
-        # Delete original images
-        for image_type in ["primary", "secondary", "label"]:
-            blob_name = f"originals/{upload_id}/{image_type}.jpg"
-            blob = self.bucket.blob(blob_name)
-            try:
-                blob.delete()
-            except Exception as e:
-                print(f"Error deleting {blob_name}: {e}")
+    def upload_bytes(self, data: bytes, blob_name: str, content_type: str) -> str:
+        """Upload encoded bytes to GCS and return the public URL."""
+        blob = self.bucket.blob(blob_name)
+        blob.cache_control = CACHE_CONTROL
+        blob.upload_from_string(data, content_type=content_type)
+        return blob.public_url
 
-        # Delete processed images
-        for image_type in ["primary", "secondary", "label"]:
-            blob_name = f"processed/{upload_id}/{image_type}.jpg"
-            blob = self.bucket.blob(blob_name)
+    def download_bytes(self, blob_name: str) -> bytes:
+        """Download a blob's contents."""
+        return self.bucket.blob(blob_name).download_as_bytes()
+
+    def upload_derivatives(
+        self,
+        upload_id: str,
+        images: Dict,
+        widths: Iterable[int],
+        formats: Iterable[str],
+    ) -> Dict:
+        """
+        Upload resized and re-encoded copies of the processed images.
+
+        Args:
+            upload_id: Unique identifier for the upload session
+            images: Dict with 'primary', 'secondary', 'label' BGR numpy arrays
+            widths: Target widths in pixels
+            formats: Output formats (see prelovium.utils.derivatives.FORMATS)
+
+        Returns:
+            Dict of image_type -> format -> width -> public URL
+        """
+        items = [
+            (image_type, width, image_format, data)
+            for image_type, image_data in images.items()
+            for width, image_format, data in build_derivatives(
+                image_data, widths, formats
+            )
+        ]
+
+        def upload(item):
+            image_type, width, image_format, data = item
+            blob_name = derivative_blob_name(upload_id, image_type, width, image_format)
+            return self.upload_bytes(data, blob_name, content_type(image_format))
+
+        # Uploads are network-bound, so send them concurrently
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            urls = list(executor.map(upload, items))
+
+        derivative_urls = {image_type: {} for image_type in images}
+        for (image_type, width, image_format, _), url in zip(items, urls):
+            derivative_urls[image_type].setdefault(image_format, {})[str(width)] = url
+        return derivative_urls
+
+    def list_blobs(self, prefix: str, page_size: int = 1000) -> Iterator:
+        """
+        Iterate over all blobs under a prefix, fetching one page at a time.
+
+        Args:
+            prefix: Blob name prefix to list
+            page_size: Number of blobs requested per page
+
+        Yields:
+            Blob objects with name, size and time_created populated
+        """
+        iterator = self.client.list_blobs(
+            self.bucket, prefix=prefix, page_size=page_size
+        )
+        for page in iterator.pages:
+            yield from page
+
+    def delete_blobs(self, blobs: Iterable, batch_size: int = 100) -> Tuple[int, int]:
+        """
+        Delete blobs using batched requests.
+
+        A batch raises if any of its deletes fails, even though the rest went
+        through, so a failed batch is retried one blob at a time. Blobs that
+        are already gone (e.g. removed by another sweeper) count as deleted.
+
+        Args:
+            blobs: Blob objects to delete
+            batch_size: Number of deletes sent per batch request
+
+        Returns:
+            Tuple of (deleted blob count, deleted bytes)
+        """
+        blobs = list(blobs)
+        deleted_count = 0
+        deleted_bytes = 0
+        for start in range(0, len(blobs), batch_size):
+            batch = blobs[start : start + batch_size]
             try:
-                blob.delete()
+                with self.client.batch():
+                    for blob in batch:
+                        blob.delete()
             except Exception as e:
-                print(f"Error deleting {blob_name}: {e}")
+                print(f"Error deleting batch of {len(batch)} blobs, retrying: {e}")
+                batch = [blob for blob in batch if self._delete_blob(blob)]
+            deleted_count += len(batch)
+            deleted_bytes += sum(blob.size or 0 for blob in batch)
+        return deleted_count, deleted_bytes
+
+    def _delete_blob(self, blob) -> bool:
+        """Delete a single blob, returning whether it is gone afterwards."""
+        try:
+            blob.delete()
+        except NotFound:
+            pass
+        except Exception as e:
+            print(f"Error deleting blob {blob.name}: {e}")
+            return False
+        return True
+
+    def delete_images_for_upload(self, upload_id: str) -> Tuple[int, int]:
+        """Delete all images associated with an upload session."""
+        blobs = []
+        for prefix in [f"originals/{upload_id}/", f"processed/{upload_id}/"]:
+            blobs.extend(self.list_blobs(prefix))
+        return self.delete_blobs(blobs)
 
     def generate_signed_url(self, blob_name: str, expiration_minutes: int = 60) -> str:
         """Generate a signed URL for private access to a blob."""
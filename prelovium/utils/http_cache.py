@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Far-future caching for assets whose URL changes whenever their content does
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+
+class CachedJSON:
+    """A JSON payload serialized once, with its ETag and compressed variants.
+
+    There is no Last-Modified: rows change after they are created (e.g. when
+    derivatives are filled in), so clients revalidate with the ETag only.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.body = json.dumps(data).encode("utf-8")
+        self.etag = hashlib.sha256(self.body).hexdigest()
+        self._encoded = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        """Return the body compressed with ``encoding``, compressing on first use."""
+        if encoding not in self._encoded:
+            if encoding == "br":
+                self._encoded[encoding] = brotli.compress(self.body)
+            else:
+                self._encoded[encoding] = gzip.compress(self.body)
+        return self._encoded[encoding]
+
+
+class LRUCache:
+    """Thread-safe LRU cache with optional expiry.
+
+    clear() also discards values still being built, so they cannot outlive
+    the invalidation.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get_or_create(self, key, factory: Callable[[], Optional[object]]):
+        """
+        Return the cached value for key, building it with factory() on a miss.
+
+        Entries older than ``ttl`` seconds count as misses. A None result is
+        returned but not cached. A value built while clear() ran is returned
+        but not stored.
+        """
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                value, expires = cached
+                if expires is None or time.monotonic() < expires:
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+            generation = self._generation
+
+        value = factory()
+        if value is None or self.maxsize <= 0:
+            return value
+
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+def _negotiate_encoding(compress: bool) -> Optional[str]:
+    if not compress:
+        return None
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def json_response(entry: CachedJSON, compress: bool = True) -> Response:
+    """
+    Build a conditional JSON response from a cached entry.
+
+    Clients must revalidate (Cache-Control: no-cache), and a matching
+    If-None-Match gets an empty 304.
+    """
+    encoding = None
+    if len(entry.body) >= MIN_COMPRESS_SIZE:
+        encoding = _negotiate_encoding(compress)
+
+    body = entry.encoded(encoding) if encoding else entry.body
+    response = Response(body, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+        response.set_etag(f"{entry.etag}-{encoding}")
+    else:
+        response.set_etag(entry.etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def make_immutable(response: Response) -> Response:
+    """Mark a response as cacheable forever by browsers and shared caches."""
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,52 @@
+import numpy as np
+from PIL import Image, ImageOps
+
+DECODE_MAX_SIDE = 2048  # longest side inputs are decoded at for the full render
+# JPEG DCT scaling can only reduce by these factors
+DRAFT_SCALES = (8, 4, 2)
+# A reduction is used as long as the result keeps at least this fraction of
+# max_side, so e.g. a 4032x3024 photo decodes at 2016x1512 rather than in full
+DRAFT_MIN_FRACTION = 0.75
+
+
+def draft_scale(size, max_side: int) -> int:
+    """Reduction factor a JPEG of this (width, height) is decoded at for max_side."""
+    for scale in DRAFT_SCALES:
+        if max(size) / scale >= max_side * DRAFT_MIN_FRACTION:
+            return scale
+    return 1
+
+
+def decoded_size(image_format: str, size, max_side: int):
+    """(width, height) an image is decoded at, before it is downscaled to max_side."""
+    if image_format != "JPEG":
+        return size
+    scale = draft_scale(size, max_side)
+    width, height = size
+    return -(-width // scale), -(-height // scale)
+
+
+def open_image(source, max_side=DECODE_MAX_SIDE):
+    """Open an RGB PIL image whose longest side is at most max_side.
+
+    JPEGs are decoded with DCT-domain scaling (``Image.draft``) by the largest
+    power of two that keeps DRAFT_MIN_FRACTION of max_side, so the result may
+    be slightly smaller than max_side. Other formats are decoded in full and
+    then downscaled.
+    """
+    image = Image.open(source)
+    if image.format == "JPEG":
+        scale = draft_scale(image.size, max_side)
+        if scale > 1:
+            # draft() picks the largest reduction that stays at or above the
+            # requested size, so ask for the floor of the scaled size
+            width, height = image.size
+            image.draft("RGB", (width // scale, height // scale))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((max_side, max_side))
+    return image
+
+
+def load_image_reduced(source, max_side=DECODE_MAX_SIDE):
+    """Load an RGB numpy image, decoding at most max_side pixels on its longest side."""
+    return np.asarray(open_image(source, max_side))
@@ -2,7 +2,8 @@ import cv2
 import numpy as np
 from PIL import Image
 from transformers import pipeline
-import tempfile
+
+from prelovium.utils.image_loading import DECODE_MAX_SIDE, open_image
 
 BLUR_AMOUNT = 32  # blor of shadow
 OFFSET_X = -25  # Horizontal offset for the shadow
@@ -13,15 +14,14 @@ BOTTOM_COLOR = [235, 235, 235]  # rgb
 VIGNETTE_EXPONENT = 2  # harshness of vignette onset
 VIGNETTE_SCALE = 0.1  # intensity/darkness of vignette
 PADDING = 0.1
+PREVIEW_MAX_SIDE = 384  # longest side of the low-resolution preview
 
 pipe = pipeline("image-segmentation", model="briaai/RMBG-1.4", trust_remote_code=True)
 
 
-def remove_background(image_path):
+def remove_background(source, max_side=DECODE_MAX_SIDE):
     """using hf model for background removal"""
-    pillow_image = pipe(image_path)
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
-        pillow_image.save(temp_file.name, "PNG")
+    pillow_image = pipe(open_image(source, max_side))
     return pillow_image
 
 
@@ -30,9 +30,6 @@ def trim_and_pad_image(image, padding_ratio=0.1, vertical_ratio=1.333):
     bbox = image.getbbox()
     trimmed_image = image.crop(bbox)
 
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
-        trimmed_image.save(temp_file.name, "PNG")
-
     # add padding
     width, height = trimmed_image.size
     padding_width = int(width * padding_ratio)
@@ -42,9 +39,6 @@ def trim_and_pad_image(image, padding_ratio=0.1, vertical_ratio=1.333):
     padded_image = Image.new("RGBA", (padded_width, padded_height), (0, 0, 0, 0))
     padded_image.paste(trimmed_image, (padding_width, padding_height))
 
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
-        padded_image.save(temp_file.name, "PNG")
-
     # expand to target ratio
     if padded_height < padded_width * vertical_ratio:
         target_height = int(padded_width * vertical_ratio)
@@ -60,21 +54,9 @@ def trim_and_pad_image(image, padding_ratio=0.1, vertical_ratio=1.333):
     final_image.paste(
         padded_image, (additional_padding_width, additional_padding_height)
     )
-
-    # Save the result
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
-        final_image.save(temp_file.name, "PNG")
     return final_image
 
 
-def load_image(path, color_conversion=None):
-    """Load an image and optionally convert its color."""
-    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
-    if color_conversion:
-        image = cv2.cvtColor(image, color_conversion)
-    return image
-
-
 def extract_alpha_channel(image):
     """Extract the alpha channel and the RGB channels from an image."""
     alpha_channel = image[:, :, 3]
@@ -157,18 +139,52 @@ def add_vignette(image, exponent=2, scale=0.1):
     return cv2.subtract(image, (1 - mask))
 
 
-def prettify(path: str):
-    image_without_background = pipe(path)
+def stage_on_backdrop(image_without_background, scale=1.0):
+    """Trim, pad and composite a cut-out onto the shadowed gradient backdrop.
+
+    Shadow offset and blur are absolute pixel values tuned for full-size
+    input, so they are multiplied by ``scale`` when rendering a downscaled
+    image. The vignette is computed on normalized coordinates and needs no
+    adjustment.
+    """
     padded_image = trim_and_pad_image(image_without_background, PADDING)
     np_image = np.array(padded_image)
     alpha, fg_rgb = extract_alpha_channel(np_image)
     bg = create_gradient_bg(fg_rgb.shape, TOP_COLOR, BOTTOM_COLOR)
 
-    offset_alpha_channel = offset_alpha(alpha, OFFSET_X, OFFSET_Y)
-    alpha_blur = apply_blur_to_alpha(offset_alpha_channel, BLUR_AMOUNT)
+    blur_amount = max(1, round(BLUR_AMOUNT * scale))
+    offset_alpha_channel = offset_alpha(alpha, OFFSET_X * scale, OFFSET_Y * scale)
+    alpha_blur = apply_blur_to_alpha(offset_alpha_channel, blur_amount)
     alpha_blur_normalized = expand_and_normalize_alpha(alpha_blur)
     bg_with_shadow = create_shadow_on_bg(bg, alpha_blur_normalized, OPACITY)
     alpha_normalized = expand_and_normalize_alpha(alpha)
     image = composite_foreground_on_bg(fg_rgb, alpha_normalized, bg_with_shadow)
     final_image = add_vignette(image, exponent=VIGNETTE_EXPONENT, scale=VIGNETTE_SCALE)
     return final_image
+
+
+def prettify(path: str, max_side=DECODE_MAX_SIDE):
+    image_without_background = remove_background(path, max_side)
+    return stage_on_backdrop(image_without_background)
+
+
+def render_preview(image_without_background, max_side=PREVIEW_MAX_SIDE):
+    """Composite a downscaled copy of an existing cut-out as a quick preview."""
+    preview = image_without_background.copy()
+    preview.thumbnail((max_side, max_side))
+    scale = max(preview.size) / max(image_without_background.size)
+    return stage_on_backdrop(preview, scale)
+
+
+def thumbnail_array(image, max_side=PREVIEW_MAX_SIDE):
+    """Downscale a numpy image so its longest side is at most max_side."""
+    thumbnail = Image.fromarray(image)
+    thumbnail.thumbnail((max_side, max_side))
+    return np.asarray(thumbnail)
+
+
+def encode_jpeg(image, quality=85):
+    """Encode an RGB image as JPEG bytes."""
+    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    _, buffer = cv2.imencode(".jpeg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
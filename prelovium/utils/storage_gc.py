@@ -0,0 +1,177 @@
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Set
+
+BLOB_PREFIXES = ["originals/", "processed/"]
+
+
+def _path_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def sweep_upload_folder(
+    upload_folder: str, max_age_seconds: float, dry_run: bool = False
+) -> Dict:
+    """
+    Remove per-upload working folders older than max_age_seconds.
+
+    Args:
+        upload_folder: Directory holding one sub-folder per upload
+        max_age_seconds: Minimum age (by modification time) before removal
+        dry_run: Only report what would be removed
+
+    Returns:
+        Dict with the number of removed entries and reclaimed bytes
+    """
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    reclaimed = 0
+    if not os.path.isdir(upload_folder):
+        return {"removed": removed, "bytes": reclaimed}
+
+    for entry in os.scandir(upload_folder):
+        try:
+            if entry.stat().st_mtime > cutoff:
+                continue
+            size = _path_size(entry.path)
+            if not dry_run:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+        except OSError as e:
+            print(f"Error removing {entry.path}: {e}")
+            continue
+        removed += 1
+        reclaimed += size
+    return {"removed": removed, "bytes": reclaimed}
+
+
+def find_orphaned_blobs(
+    gcs, known_upload_ids: Set[str], grace_seconds: float, page_size: int = 1000
+) -> List:
+    """
+    List blobs whose upload_id has no matching Upload row.
+
+    Blobs younger than grace_seconds are skipped, since /process uploads
+    blobs before it commits the database row.
+
+    Args:
+        gcs: GCSStorage instance
+        known_upload_ids: upload_id values present in the database
+        grace_seconds: Minimum blob age before it counts as orphaned
+        page_size: Number of blobs requested per listing page
+
+    Returns:
+        List of orphaned Blob objects
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+    orphans = []
+    for prefix in BLOB_PREFIXES:
+        for blob in gcs.list_blobs(prefix, page_size=page_size):
+            parts = blob.name.split("/")
+            if len(parts) < 3 or parts[1] in known_upload_ids:
+                continue
+            if blob.time_created and blob.time_created > cutoff:
+                continue
+            orphans.append(blob)
+    return orphans
+
+
+def orphan_pass_refusal(dialect: str, known_upload_ids: Set[str]) -> Optional[str]:
+    """
+    Reason not to trust this database for the orphan pass, or None.
+
+    Orphans are blobs with no row in *this* database. A local SQLite file or
+    an empty uploads table usually means the process cannot see uploads made
+    by other instances (or before a restart), and their blobs would all look
+    orphaned.
+    """
+    if dialect == "sqlite":
+        return "database is SQLite and may not hold every instance's uploads"
+    if not known_upload_ids:
+        return "uploads table is empty"
+    return None
+
+
+def collect_garbage(
+    gcs,
+    upload_folder: str,
+    known_upload_ids: Set[str],
+    dialect: str,
+    temp_max_age: float,
+    orphan_grace: float,
+    dry_run: bool = False,
+    force: bool = False,
+) -> Dict:
+    """
+    Reconcile local temp space and the bucket against the uploads table.
+
+    Blobs of deleted uploads (e.g. past the retention period) are removed by
+    the orphan pass, so callers delete rows first and pass the remaining ids.
+    The orphan pass is skipped when orphan_pass_refusal() objects to the
+    database, unless force is set.
+
+    Args:
+        gcs: GCSStorage instance
+        upload_folder: Local per-upload working directory
+        known_upload_ids: upload_id values present in the database
+        dialect: SQLAlchemy dialect name of the database, e.g. "postgresql"
+        temp_max_age: Age in seconds after which local upload folders are removed
+        orphan_grace: Age in seconds after which unreferenced blobs are removed
+        dry_run: Only report what would be removed
+        force: Run the orphan pass even if the database looks incomplete
+
+    Returns:
+        Report dict with removed counts and reclaimed bytes per category
+    """
+    report = {
+        "upload_folder": sweep_upload_folder(upload_folder, temp_max_age, dry_run),
+    }
+
+    refusal = None if force else orphan_pass_refusal(dialect, known_upload_ids)
+    if refusal:
+        print(f"Skipping orphaned blob deletion: {refusal}")
+        report["orphaned_blobs"] = {"removed": 0, "bytes": 0, "skipped": refusal}
+    else:
+        orphans = find_orphaned_blobs(gcs, known_upload_ids, orphan_grace)
+        if dry_run:
+            removed = len(orphans)
+            reclaimed = sum(blob.size or 0 for blob in orphans)
+        else:
+            removed, reclaimed = gcs.delete_blobs(orphans)
+        report["orphaned_blobs"] = {"removed": removed, "bytes": reclaimed}
+
+    report["reclaimed_bytes"] = sum(section["bytes"] for section in report.values())
+    return report
+
+
+def start_background_sweeper(
+    run: Callable[[], Dict], interval_seconds: float
+) -> threading.Thread:
+    """Call run() every interval_seconds on a daemon thread."""
+
+    def loop():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                report = run()
+                print(f"Storage GC reclaimed {report['reclaimed_bytes']} bytes")
+            except Exception as e:
+                print(f"Error during storage GC: {e}")
+
+    thread = threading.Thread(target=loop, name="storage-gc", daemon=True)
+    thread.start()
+    return thread
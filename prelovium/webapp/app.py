@@ -1,15 +1,52 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    render_template,
+    request,
+    send_from_directory,
+    stream_with_context,
+)
+import click
+from sqlalchemy import event
 import os
+import threading
 from werkzeug.utils import secure_filename
 import json
+import base64
 import cv2
+import numpy as np
+from PIL import Image
 import uuid
-from datetime import datetime
-
-from prelovium.utils.image_processing import prettify, save_image, load_image
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from prelovium.utils.image_loading import DECODE_MAX_SIDE, load_image_reduced
+from prelovium.utils.image_processing import (
+    PREVIEW_MAX_SIDE,
+    encode_jpeg,
+    remove_background,
+    render_preview,
+    save_image,
+    stage_on_backdrop,
+    thumbnail_array,
+)
 from prelovium.utils.metadata import generate_metadata
-from prelovium.utils.database import db, Upload
+from prelovium.utils.database import db, Upload, add_missing_columns
+from prelovium.utils.derivatives import srcset, supported_formats
 from prelovium.utils.gcs_storage import GCSStorage
+from prelovium.utils.http_cache import (
+    CachedJSON,
+    LRUCache,
+    json_response,
+    make_immutable,
+)
+from prelovium.utils.storage_gc import collect_garbage, start_background_sweeper
+from prelovium.utils.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    estimate_request_cost,
+)
 
 app = Flask(__name__)
 
@@ -28,6 +65,56 @@ gcs = GCSStorage()
 app.config["UPLOAD_FOLDER"] = os.path.join(os.path.dirname(__file__), "temp", "uploads")
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
 
+# Longest side images are resized to in the browser and decoded at on the server
+MAX_IMAGE_SIDE = int(os.getenv("MAX_IMAGE_SIDE", DECODE_MAX_SIDE))
+
+# Memory-aware admission control for /process. Every queued request blocks a
+# gunicorn thread, so the queue must stay well below the thread count to keep
+# threads free for /health and read-only pages.
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "8"))
+admission = AdmissionController(
+    budget_bytes=int(os.getenv("ADMISSION_MEMORY_BUDGET_MB", "2048")) * 1024 * 1024,
+    max_queue=min(
+        int(os.getenv("ADMISSION_MAX_QUEUE", str(WORKER_THREADS // 2))),
+        WORKER_THREADS - 1,
+    ),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "60")),
+    retry_after=int(os.getenv("ADMISSION_RETRY_AFTER", "5")),
+)
+
+# Responsive image derivatives generated for every processed image
+DERIVATIVE_WIDTHS = [
+    int(width) for width in os.getenv("DERIVATIVE_WIDTHS", "320,800").split(",")
+]
+DERIVATIVE_FORMATS = supported_formats(
+    os.getenv("DERIVATIVE_FORMATS", "avif,webp,jpeg").split(",")
+)
+app.add_template_filter(srcset)
+# A single worker keeps encoding off the request threads without
+# competing with /process for CPU
+derivative_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="derivatives"
+)
+
+# Storage garbage collection. The web server runs it in the background only
+# when STORAGE_GC_INTERVAL is set; otherwise schedule `flask storage-gc`.
+# Retention 0 keeps uploads forever.
+STORAGE_GC_INTERVAL = float(os.getenv("STORAGE_GC_INTERVAL", "0"))
+TEMP_MAX_AGE = float(os.getenv("TEMP_MAX_AGE", "3600"))
+ORPHAN_GRACE = float(os.getenv("ORPHAN_GRACE", "3600"))
+UPLOAD_RETENTION_DAYS = int(os.getenv("UPLOAD_RETENTION_DAYS", "0"))
+storage_sweeper = None
+storage_sweeper_lock = threading.Lock()
+
+# In-process cache of serialized upload records and listings. Entries are
+# cleared when a commit in this process touches the uploads table and expire
+# after RESPONSE_CACHE_TTL seconds to pick up changes made by other instances.
+response_cache = LRUCache(
+    int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "30")),
+)
+COMPRESS_JSON = os.getenv("COMPRESS_JSON", "true").lower() in ("1", "true", "yes")
+
 # Example items
 EXAMPLES = ["jacket", "shirt", "jeans", "shoes", "boots", "pants", "suit", "jumper"]
 
@@ -41,6 +128,7 @@ EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), "examples")
 # Create database tables
 with app.app_context():
     db.create_all()
+    add_missing_columns()
 
 
 def allowed_file(filename):
@@ -55,7 +143,9 @@ def health_check():
 
 @app.route("/")
 def index():
-    return render_template("index.html", examples=EXAMPLES)
+    return render_template(
+        "index.html", examples=EXAMPLES, max_image_side=MAX_IMAGE_SIDE
+    )
 
 
 @app.route("/examples/<item_type>/<image_type>")
@@ -66,162 +156,167 @@ def example_image(item_type, image_type):
     # Serve from the new location
     example_dir = os.path.join(EXAMPLES_DIR, item_type)
     filename = f"{image_type}.jpeg"
-    return send_from_directory(example_dir, filename)
+    return make_immutable(send_from_directory(example_dir, filename))
 
 
-@app.route("/process", methods=["POST"])
-def process_images():
-    if request.is_json:
-        # Handle example request
-        data = request.get_json()
-        if "example" not in data or data["example"] not in EXAMPLES:
-            return jsonify({"error": "Invalid example request"}), 400
+def _example_paths(example_type):
+    example_folder = os.path.join(EXAMPLES_DIR, example_type)
+    return {
+        image_type: os.path.join(example_folder, f"{image_type}.jpeg")
+        for image_type in ["primary", "secondary", "label"]
+    }
 
-        example_type = data["example"]
-        example_folder = os.path.join(EXAMPLES_DIR, example_type)
-        primary_path = os.path.join(example_folder, "primary.jpeg")
 
-        # Process example images
-        secondary_path = os.path.join(example_folder, "secondary.jpeg")
-        label_path = os.path.join(example_folder, "label.jpeg")
+def _generate_derivatives(upload_id, processed_images, reservation):
+    """Upload resized copies of the processed (RGB) images and record them."""
+    try:
+        images = {
+            image_type: cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            for image_type, image in processed_images.items()
+        }
+        derivatives = gcs.upload_derivatives(
+            upload_id, images, DERIVATIVE_WIDTHS, DERIVATIVE_FORMATS
+        )
+        with app.app_context():
+            upload = Upload.query.filter_by(upload_id=upload_id).first()
+            if upload:
+                upload.derivatives = json.dumps(derivatives)
+                db.session.commit()
+    except Exception as e:
+        print(f"Error generating derivatives for {upload_id}: {e}")
+    finally:
+        reservation.release()
 
-        # Create a unique folder for this example
-        upload_id = secure_filename(f"example_{example_type}_{str(uuid.uuid4())[:8]}")
-        upload_folder = os.path.join(app.config["UPLOAD_FOLDER"], upload_id)
-        os.makedirs(upload_folder, exist_ok=True)
 
-        # Process images
-        primary_image = prettify(primary_path)
-        secondary_image = prettify(secondary_path)
-        label_image = load_image(label_path, cv2.COLOR_BGR2RGB)
-
-        # Save processed images locally for metadata generation
-        save_image(os.path.join(upload_folder, "primary_processed.jpeg"), primary_image)
-        save_image(
-            os.path.join(upload_folder, "secondary_processed.jpeg"), secondary_image
-        )
-        save_image(os.path.join(upload_folder, "label_processed.jpeg"), label_image)
+def _schedule_derivatives(upload_id, processed_images, reservation):
+    """Generate derivatives after the response has been sent.
 
-        # Generate metadata
-        metadata = generate_metadata(upload_folder)
+    The job takes over the request's memory reservation, since it keeps the
+    processed images alive until it finishes.
+    """
+    derivative_executor.submit(
+        _generate_derivatives, upload_id, processed_images, reservation
+    )
 
-        try:
-            # Upload to Google Cloud Storage
-            original_files = {
-                "primary": primary_path,
-                "secondary": secondary_path,
-                "label": label_path,
-            }
-            processed_images = {
-                "primary": primary_image,
-                "secondary": secondary_image,
-                "label": label_image,
-            }
-
-            original_urls, processed_urls = gcs.upload_images_for_upload(
-                upload_id, original_files, processed_images
-            )
 
-            # Save to database
-            upload_record = Upload.from_metadata(
-                upload_id, original_urls, processed_urls, metadata
-            )
-            db.session.add(upload_record)
-            db.session.commit()
+def _data_url(image):
+    encoded = base64.b64encode(encode_jpeg(image)).decode("ascii")
+    return f"data:image/jpeg;base64,{encoded}"
 
-            # Clean up local files
-            import shutil
 
-            shutil.rmtree(upload_folder)
+def _render_images(reservation, paths, preview):
+    """Segment each image once, optionally yield a preview, return full renders.
 
-            return jsonify(
-                {
-                    "primary": processed_urls["primary"],
-                    "secondary": processed_urls["secondary"],
-                    "label": processed_urls["label"],
-                    "metadata": metadata,
-                    "upload_id": upload_id,
-                }
-            )
+    The preview is composited from a downscaled copy of the same cut-out the
+    full render uses, so segmentation never runs twice.
+    """
+    primary_cutout = remove_background(paths["primary"], MAX_IMAGE_SIDE)
+    secondary_cutout = remove_background(paths["secondary"], MAX_IMAGE_SIDE)
+    label_image = load_image_reduced(paths["label"], MAX_IMAGE_SIDE)
 
-        except Exception as e:
-            print(f"Error processing example: {e}")
-            # Fallback to local serving
-            return jsonify(
-                {
-                    "primary": f"/uploads/{upload_id}/primary_processed.jpeg",
-                    "secondary": f"/uploads/{upload_id}/secondary_processed.jpeg",
-                    "label": f"/uploads/{upload_id}/label_processed.jpeg",
-                    "metadata": metadata,
-                    "upload_id": upload_id,
-                }
-            )
+    if preview:
+        yield {
+            "type": "preview",
+            "primary": _data_url(render_preview(primary_cutout)),
+            "secondary": _data_url(render_preview(secondary_cutout)),
+            "label": _data_url(thumbnail_array(label_image, PREVIEW_MAX_SIDE)),
+        }
 
-    # Handle file upload request
-    if (
-        "primary" not in request.files
-        or "secondary" not in request.files
-        or "label" not in request.files
-    ):
-        return jsonify({"error": "Missing required images"}), 400
+    images = {
+        "primary": stage_on_backdrop(primary_cutout),
+        "secondary": stage_on_backdrop(secondary_cutout),
+        "label": label_image,
+    }
+    # Compositing temporaries are gone; only the results stay in memory
+    reservation.release_peak()
+    return images
 
-    primary = request.files["primary"]
-    secondary = request.files["secondary"]
-    label = request.files["label"]
 
-    if not all([primary.filename, secondary.filename, label.filename]):
-        return jsonify({"error": "No selected files"}), 400
+def _save_processed(upload_folder, images):
+    """Save processed images locally for metadata generation."""
+    for image_type, image in images.items():
+        save_image(os.path.join(upload_folder, f"{image_type}_processed.jpeg"), image)
 
-    if not all([allowed_file(f.filename) for f in [primary, secondary, label]]):
-        return (
-            jsonify({"error": f"Invalid file type, Please use .png, .jpg or .jpeg"}),
-            400,
+
+def _process_example(reservation, example_type, preview):
+    paths = _example_paths(example_type)
+
+    # Create a unique folder for this example
+    upload_id = secure_filename(f"example_{example_type}_{str(uuid.uuid4())[:8]}")
+    upload_folder = os.path.join(app.config["UPLOAD_FOLDER"], upload_id)
+    os.makedirs(upload_folder, exist_ok=True)
+
+    # Process images
+    processed_images = yield from _render_images(reservation, paths, preview)
+    _save_processed(upload_folder, processed_images)
+
+    # Generate metadata
+    metadata = generate_metadata(upload_folder)
+
+    try:
+        # Upload to Google Cloud Storage
+        original_urls, processed_urls = gcs.upload_images_for_upload(
+            upload_id, paths, processed_images
         )
 
+        # Save to database
+        upload_record = Upload.from_metadata(
+            upload_id, original_urls, processed_urls, metadata
+        )
+        db.session.add(upload_record)
+        db.session.commit()
+        _schedule_derivatives(upload_id, processed_images, reservation.detach())
+
+        # Clean up local files
+        import shutil
+
+        shutil.rmtree(upload_folder)
+
+        yield {
+            "type": "result",
+            "primary": processed_urls["primary"],
+            "secondary": processed_urls["secondary"],
+            "label": processed_urls["label"],
+            "metadata": metadata,
+            "upload_id": upload_id,
+        }
+
+    except Exception as e:
+        print(f"Error processing example: {e}")
+        # Fallback to local serving
+        yield {
+            "type": "result",
+            "primary": f"/uploads/{upload_id}/primary_processed.jpeg",
+            "secondary": f"/uploads/{upload_id}/secondary_processed.jpeg",
+            "label": f"/uploads/{upload_id}/label_processed.jpeg",
+            "metadata": metadata,
+            "upload_id": upload_id,
+        }
+
+
+def _process_upload(reservation, files, preview):
     # Create a unique upload ID
     upload_id = str(uuid.uuid4())
     upload_folder = os.path.join(app.config["UPLOAD_FOLDER"], upload_id)
     os.makedirs(upload_folder, exist_ok=True)
 
     # Save uploaded files
-    primary_path = os.path.join(upload_folder, "primary.jpeg")
-    secondary_path = os.path.join(upload_folder, "secondary.jpeg")
-    label_path = os.path.join(upload_folder, "label.jpeg")
-
-    primary.save(primary_path)
-    secondary.save(secondary_path)
-    label.save(label_path)
+    paths = {}
+    for image_type, file in files.items():
+        paths[image_type] = os.path.join(upload_folder, f"{image_type}.jpeg")
+        file.save(paths[image_type])
 
     try:
         # Process images
-        primary_image = prettify(primary_path)
-        secondary_image = prettify(secondary_path)
-        label_image = load_image(label_path, cv2.COLOR_BGR2RGB)
-
-        # Save processed images locally for metadata generation
-        save_image(os.path.join(upload_folder, "primary_processed.jpeg"), primary_image)
-        save_image(
-            os.path.join(upload_folder, "secondary_processed.jpeg"), secondary_image
-        )
-        save_image(os.path.join(upload_folder, "label_processed.jpeg"), label_image)
+        processed_images = yield from _render_images(reservation, paths, preview)
+        _save_processed(upload_folder, processed_images)
 
         # Generate metadata
         metadata = generate_metadata(upload_folder)
 
         # Upload to Google Cloud Storage
-        original_files = {
-            "primary": primary_path,
-            "secondary": secondary_path,
-            "label": label_path,
-        }
-        processed_images = {
-            "primary": primary_image,
-            "secondary": secondary_image,
-            "label": label_image,
-        }
-
         original_urls, processed_urls = gcs.upload_images_for_upload(
-            upload_id, original_files, processed_images
+            upload_id, paths, processed_images
         )
 
         # Save to database
@@ -230,21 +325,21 @@ def process_images():
         )
         db.session.add(upload_record)
         db.session.commit()
+        _schedule_derivatives(upload_id, processed_images, reservation.detach())
 
         # Clean up local files
         import shutil
 
         shutil.rmtree(upload_folder)
 
-        return jsonify(
-            {
-                "primary": processed_urls["primary"],
-                "secondary": processed_urls["secondary"],
-                "label": processed_urls["label"],
-                "metadata": metadata,
-                "upload_id": upload_id,
-            }
-        )
+        yield {
+            "type": "result",
+            "primary": processed_urls["primary"],
+            "secondary": processed_urls["secondary"],
+            "label": processed_urls["label"],
+            "metadata": metadata,
+            "upload_id": upload_id,
+        }
 
     except Exception as e:
         print(f"Error processing upload: {e}")
@@ -253,12 +348,170 @@ def process_images():
 
         if os.path.exists(upload_folder):
             shutil.rmtree(upload_folder)
-        return jsonify({"error": "Failed to process images"}), 500
+
+        # Remove any blobs uploaded before the failure
+        try:
+            gcs.delete_images_for_upload(upload_id)
+        except Exception as cleanup_error:
+            print(f"Error cleaning up blobs for {upload_id}: {cleanup_error}")
+        yield {"type": "error", "error": "Failed to process images", "status": 500}
+
+
+def _wants_stream():
+    """Whether the client asked for NDJSON progress events."""
+    best = request.accept_mimetypes.best_match(
+        ["application/json", "application/x-ndjson"]
+    )
+    return best == "application/x-ndjson"
+
+
+def _run_admitted(cost, handler, *args):
+    """Run a processing handler once the admission controller grants its cost.
+
+    ``cost`` is a (peak, retained) tuple. The handler is a generator of
+    events: NDJSON clients receive each one as it happens (a low-resolution
+    preview first), everyone else gets the final result as plain JSON. The
+    reservation is held until the last event has been produced.
+    """
+    peak, retained = cost
+    try:
+        reservation = admission.acquire(peak + retained, retained)
+    except AdmissionRejected as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 429
+
+    stream = _wants_stream()
+    events = handler(reservation, *args, stream)
+
+    if stream:
+
+        def generate():
+            try:
+                for event in events:
+                    yield json.dumps(event) + "\n"
+            except Exception as e:
+                print(f"Error processing images: {e}")
+                yield json.dumps({"type": "error", "error": "Failed to process images"})
+                yield "\n"
+            finally:
+                reservation.release()
+
+        response = Response(
+            stream_with_context(generate()), mimetype="application/x-ndjson"
+        )
+        # Also covers clients that disconnect before the body is iterated
+        response.call_on_close(reservation.release)
+        return response
+
+    try:
+        for event in events:
+            if event["type"] == "error":
+                return jsonify({"error": event["error"]}), event["status"]
+            if event["type"] == "result":
+                event.pop("type")
+                return jsonify(event)
+    finally:
+        reservation.release()
+
+
+def _uploaded_files():
+    """Return the validated primary/secondary/label uploads or an error response."""
+    if (
+        "primary" not in request.files
+        or "secondary" not in request.files
+        or "label" not in request.files
+    ):
+        return None, (jsonify({"error": "Missing required images"}), 400)
+
+    primary = request.files["primary"]
+    secondary = request.files["secondary"]
+    label = request.files["label"]
+
+    if not all([primary.filename, secondary.filename, label.filename]):
+        return None, (jsonify({"error": "No selected files"}), 400)
+
+    if not all([allowed_file(f.filename) for f in [primary, secondary, label]]):
+        return None, (
+            jsonify({"error": f"Invalid file type, Please use .png, .jpg or .jpeg"}),
+            400,
+        )
+
+    return {"primary": primary, "secondary": secondary, "label": label}, None
+
+
+@app.route("/process", methods=["POST"])
+def process_images():
+    if request.is_json:
+        # Handle example request
+        data = request.get_json()
+        if "example" not in data or data["example"] not in EXAMPLES:
+            return jsonify({"error": "Invalid example request"}), 400
+
+        example_type = data["example"]
+        paths = _example_paths(example_type)
+        cost = estimate_request_cost(
+            [paths["primary"], paths["secondary"]], [paths["label"]], MAX_IMAGE_SIDE
+        )
+        return _run_admitted(cost, _process_example, example_type)
+
+    # Handle file upload request
+    files, error = _uploaded_files()
+    if error:
+        return error
+
+    # Size the request from the image headers before anything is decoded
+    try:
+        cost = estimate_request_cost(
+            [files["primary"].stream, files["secondary"].stream],
+            [files["label"].stream],
+            MAX_IMAGE_SIDE,
+        )
+    except Image.DecompressionBombError as e:
+        print(f"Rejected oversized image: {e}")
+        return jsonify({"error": "Image dimensions are too large"}), 413
+    except (OSError, ValueError) as e:
+        print(f"Error reading image headers: {e}")
+        return jsonify({"error": "Could not read image files"}), 400
+
+    return _run_admitted(cost, _process_upload, files)
+
+
+@app.route("/api/admission")
+def api_admission():
+    """API endpoint exposing memory budget and queue statistics."""
+    return jsonify(admission.stats())
 
 
 @app.route("/uploads/<path:filename>")
 def uploaded_file(filename):
-    return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+    # Upload folders are unique per upload, so their files never change
+    return make_immutable(send_from_directory(app.config["UPLOAD_FOLDER"], filename))
+
+
+def _load_uploads():
+    uploads = Upload.query.order_by(Upload.created_at.desc()).all()
+    return CachedJSON([upload.to_dict() for upload in uploads])
+
+
+def _load_upload(upload_id):
+    upload = Upload.query.filter_by(upload_id=upload_id).first()
+    if not upload:
+        return None
+    return CachedJSON(upload.to_dict())
+
+
+@event.listens_for(db.session, "after_flush")
+def _track_upload_changes(session, flush_context):
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    if any(isinstance(instance, Upload) for instance in changed):
+        session.info["uploads_changed"] = True
+
+
+@event.listens_for(db.session, "after_commit")
+def _invalidate_response_cache(session):
+    if session.info.pop("uploads_changed", False):
+        response_cache.clear()
 
 
 @app.route("/history")
@@ -266,8 +519,7 @@ def history():
     """Display all previous uploads."""
     try:
         # Get all uploads ordered by most recent first
-        uploads = Upload.query.order_by(Upload.created_at.desc()).all()
-        uploads_data = [upload.to_dict() for upload in uploads]
+        uploads_data = response_cache.get_or_create("uploads", _load_uploads).data
 
         return render_template("history.html", uploads=uploads_data)
     except Exception as e:
@@ -281,9 +533,8 @@ def history():
 def api_uploads():
     """API endpoint to get all uploads as JSON."""
     try:
-        uploads = Upload.query.order_by(Upload.created_at.desc()).all()
-        uploads_data = [upload.to_dict() for upload in uploads]
-        return jsonify(uploads_data)
+        entry = response_cache.get_or_create("uploads", _load_uploads)
+        return json_response(entry, COMPRESS_JSON)
     except Exception as e:
         print(f"Error loading uploads: {e}")
         return jsonify({"error": "Failed to load uploads"}), 500
@@ -293,15 +544,114 @@ def api_uploads():
 def api_upload_detail(upload_id):
     """API endpoint to get details of a specific upload."""
     try:
-        upload = Upload.query.filter_by(upload_id=upload_id).first()
-        if not upload:
+        entry = response_cache.get_or_create(
+            ("upload", upload_id), lambda: _load_upload(upload_id)
+        )
+        if not entry:
             return jsonify({"error": "Upload not found"}), 404
 
-        return jsonify(upload.to_dict())
+        return json_response(entry, COMPRESS_JSON)
     except Exception as e:
         print(f"Error loading upload {upload_id}: {e}")
         return jsonify({"error": "Failed to load upload"}), 500
 
 
+@app.cli.command("backfill-derivatives")
+def backfill_derivatives():
+    """Generate image derivatives for uploads processed before they existed."""
+    uploads = Upload.query.filter(Upload.derivatives.is_(None)).all()
+    print(f"Backfilling derivatives for {len(uploads)} uploads")
+
+    for upload in uploads:
+        try:
+            images = {}
+            for image_type in ["primary", "secondary", "label"]:
+                data = gcs.download_bytes(
+                    f"processed/{upload.upload_id}/{image_type}.jpg"
+                )
+                images[image_type] = cv2.imdecode(
+                    np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR
+                )
+
+            derivatives = gcs.upload_derivatives(
+                upload.upload_id, images, DERIVATIVE_WIDTHS, DERIVATIVE_FORMATS
+            )
+            upload.derivatives = json.dumps(derivatives)
+            db.session.commit()
+            print(f"Backfilled {upload.upload_id}")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error backfilling {upload.upload_id}: {e}")
+
+
+def run_storage_gc(dry_run=False, force=False):
+    """Reconcile temp space and the bucket with the uploads table.
+
+    Expired rows are deleted first; their blobs then have no matching row
+    and are removed by the orphan pass. That pass is skipped on SQLite or an
+    empty table unless force is set, since the bucket is shared by every
+    instance.
+    """
+    with app.app_context():
+        expired = []
+        if UPLOAD_RETENTION_DAYS > 0:
+            cutoff = datetime.utcnow() - timedelta(days=UPLOAD_RETENTION_DAYS)
+            expired = Upload.query.filter(Upload.created_at < cutoff).all()
+        expired_ids = {upload.upload_id for upload in expired}
+
+        if expired and not dry_run:
+            for upload in expired:
+                db.session.delete(upload)
+            db.session.commit()
+
+        known_upload_ids = {
+            upload_id
+            for (upload_id,) in db.session.query(Upload.upload_id)
+            if upload_id not in expired_ids
+        }
+        report = collect_garbage(
+            gcs,
+            app.config["UPLOAD_FOLDER"],
+            known_upload_ids,
+            db.engine.dialect.name,
+            TEMP_MAX_AGE,
+            ORPHAN_GRACE,
+            dry_run,
+            force,
+        )
+        report["expired_uploads"] = len(expired)
+        return report
+
+
+@app.cli.command("storage-gc")
+@click.option("--dry-run", is_flag=True, help="Report without deleting anything.")
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Delete orphaned blobs even on SQLite or an empty uploads table.",
+)
+def storage_gc(dry_run, force):
+    """Remove stale upload folders, expired uploads and orphaned blobs."""
+    report = run_storage_gc(dry_run, force)
+    print(json.dumps(report, indent=2))
+
+
+@app.before_request
+def start_storage_sweeper():
+    """Start the opt-in background sweeper with the first request served.
+
+    Starting it here rather than at import keeps CLI commands and other
+    importers of this module from running it.
+    """
+    global storage_sweeper
+    if STORAGE_GC_INTERVAL <= 0 or storage_sweeper is not None:
+        return
+    with storage_sweeper_lock:
+        if storage_sweeper is None:
+            storage_sweeper = start_background_sweeper(
+                run_storage_gc, STORAGE_GC_INTERVAL
+            )
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080, debug=True)
@@ -4,14 +4,70 @@ document.addEventListener('DOMContentLoaded', function() {
     const results = document.getElementById('results');
     const onlineAd = document.getElementById('onlineAd');
 
+    // Show the images from a /process "preview" or "result" NDJSON event
+    function showImages(data) {
+        document.querySelectorAll('.result-image img').forEach((img, index) => {
+            const key = ['primary', 'secondary', 'label'][index];
+            img.src = data[key];
+        });
+        results.classList.remove('hidden');
+    }
+
+    // Stream /process as NDJSON: a low-resolution preview arrives first and
+    // the final images and ad replace it when they are ready
+    async function processWithPreview(options) {
+        loading.classList.remove('hidden');
+        let previewShown = false;
+
+        try {
+            const response = await fetch('/process', {
+                ...options,
+                headers: { ...(options.headers || {}), 'Accept': 'application/x-ndjson' }
+            });
+
+            if (!response.ok) {
+                throw new Error('Failed to process images');
+            }
+
+            let finished = false;
+            for await (const event of readEvents(response)) {
+                if (event.type === 'preview') {
+                    showImages(event);
+                    onlineAd.innerHTML = '<p class="text-gray-500">Rendering full resolution and generating ad...</p>';
+                    loading.classList.add('hidden');
+                    previewShown = true;
+                } else if (event.type === 'result') {
+                    // Display results
+                    showImages(event);
+
+                    // Display online ad
+                    onlineAd.innerHTML = renderOnlineAd(event.metadata);
+                    finished = true;
+                } else if (event.type === 'error') {
+                    throw new Error(event.error);
+                }
+            }
+
+            if (!finished) {
+                throw new Error('Processing ended without a result');
+            }
+        } catch (error) {
+            // Don't leave a preview and its progress message next to the alert
+            if (previewShown) {
+                onlineAd.innerHTML = '';
+                results.classList.add('hidden');
+            }
+            throw error;
+        } finally {
+            loading.classList.add('hidden');
+        }
+    }
+
     // Handle example selection
     document.querySelectorAll('.example-btn').forEach(button => {
         button.addEventListener('click', async function() {
             const exampleType = this.dataset.example;
-            
-            // Show loading state
-            loading.classList.remove('hidden');
-            
+
             try {
                 // Show original example images in preview containers
                 const imageTypes = ['primary', 'secondary', 'label'];
@@ -23,7 +79,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 });
 
                 // Load example images
-                const response = await fetch('/process', {
+                await processWithPreview({
                     method: 'POST',
                     body: JSON.stringify({
                         example: exampleType
@@ -32,29 +88,9 @@ document.addEventListener('DOMContentLoaded', function() {
                         'Content-Type': 'application/json'
                     }
                 });
-
-                if (!response.ok) {
-                    throw new Error('Failed to process example images');
-                }
-
-                const data = await response.json();
-                
-                // Display results
-                document.querySelectorAll('.result-image img').forEach((img, index) => {
-                    const key = ['primary', 'secondary', 'label'][index];
-                    img.src = data[key];
-                });
-
-                // Display online ad
-                onlineAd.innerHTML = renderOnlineAd(data.metadata);
-                
-                // Show results section
-                results.classList.remove('hidden');
             } catch (error) {
                 console.error('Error:', error);
                 alert('Failed to load example images. Please try again.');
-            } finally {
-                loading.classList.add('hidden');
             }
         });
     });
@@ -63,39 +99,16 @@ document.addEventListener('DOMContentLoaded', function() {
     form.addEventListener('submit', async function(e) {
         e.preventDefault();
         
-        const formData = new FormData(form);
-        
-        // Show loading state
-        loading.classList.remove('hidden');
-        
         try {
-            const response = await fetch('/process', {
+            const formData = await downscaledFormData(form, Number(form.dataset.maxSide));
+
+            await processWithPreview({
                 method: 'POST',
                 body: formData
             });
-
-            if (!response.ok) {
-                throw new Error('Failed to process images');
-            }
-
-            const data = await response.json();
-            
-            // Display results
-            document.querySelectorAll('.result-image img').forEach((img, index) => {
-                const key = ['primary', 'secondary', 'label'][index];
-                img.src = data[key];
-            });
-
-            // Display online ad
-            onlineAd.innerHTML = renderOnlineAd(data.metadata);
-            
-            // Show results section
-            results.classList.remove('hidden');
         } catch (error) {
             console.error('Error:', error);
             alert('Failed to process images. Please try again.');
-        } finally {
-            loading.classList.add('hidden');
         }
     });
 
@@ -119,6 +132,72 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// Parse an NDJSON response body into events as lines arrive
+async function* readEvents(response) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+
+        let newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+            const line = buffer.slice(0, newline).trim();
+            buffer = buffer.slice(newline + 1);
+            if (line) yield JSON.parse(line);
+        }
+
+        if (done) break;
+    }
+
+    if (buffer.trim()) yield JSON.parse(buffer);
+}
+
+// Resize an image so its longest side is at most maxSide and re-encode it as
+// JPEG. Files that are already small enough JPEGs are returned unchanged.
+async function downscaleImage(file, maxSide, quality = 0.9) {
+    if (!maxSide || typeof createImageBitmap !== 'function') return file;
+
+    const bitmap = await createImageBitmap(file, { imageOrientation: 'from-image' });
+    const scale = Math.min(1, maxSide / Math.max(bitmap.width, bitmap.height));
+    if (scale === 1 && file.type === 'image/jpeg') {
+        bitmap.close();
+        return file;
+    }
+
+    const canvas = document.createElement('canvas');
+    canvas.width = Math.round(bitmap.width * scale);
+    canvas.height = Math.round(bitmap.height * scale);
+    const context = canvas.getContext('2d');
+    context.fillStyle = '#ffffff';
+    context.fillRect(0, 0, canvas.width, canvas.height);
+    context.drawImage(bitmap, 0, 0, canvas.width, canvas.height);
+    bitmap.close();
+
+    const blob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg', quality));
+    if (!blob) return file;
+    const name = file.name.replace(/\.[^.]+$/, '') + '.jpg';
+    return new File([blob], name, { type: 'image/jpeg' });
+}
+
+// Build the upload form data with every image downscaled before sending
+async function downscaledFormData(form, maxSide) {
+    const formData = new FormData(form);
+    for (const input of form.querySelectorAll('input[type="file"]')) {
+        const file = input.files[0];
+        if (!file) continue;
+        try {
+            const resized = await downscaleImage(file, maxSide);
+            formData.set(input.name, resized, resized.name);
+        } catch (error) {
+            console.error(`Could not downscale ${input.name}, uploading original:`, error);
+        }
+    }
+    return formData;
+}
+
 // Helper function to render metadata as HTML
 function renderOnlineAd(m) {
     if (!m) return '';
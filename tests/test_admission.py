@@ -0,0 +1,153 @@
+import io
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from prelovium.utils.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    decoded_pixels,
+)
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+def test_admits_within_budget_and_releases():
+    controller = AdmissionController(budget_bytes=100)
+
+    with controller.admit(60):
+        assert controller.stats()["in_use_bytes"] == 60
+        assert controller.stats()["active"] == 1
+
+    stats = controller.stats()
+    assert stats["in_use_bytes"] == 0
+    assert stats["active"] == 0
+    assert stats["admitted"] == 1
+
+
+def test_oversized_request_is_clamped_to_budget():
+    controller = AdmissionController(budget_bytes=100)
+
+    with controller.admit(500):
+        assert controller.stats()["in_use_bytes"] == 100
+
+
+def test_waiters_are_admitted_in_fifo_order():
+    controller = AdmissionController(budget_bytes=100, max_queue=3, queue_timeout=5)
+    blocker = controller.acquire(100)
+    order = []
+
+    def worker(name):
+        with controller.admit(100):
+            order.append(name)
+
+    threads = []
+    for name in ["first", "second", "third"]:
+        thread = threading.Thread(target=worker, args=(name,))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: controller.stats()["queued"] == len(threads))
+
+    blocker.release()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert order == ["first", "second", "third"]
+
+
+def test_full_queue_is_rejected_immediately():
+    controller = AdmissionController(
+        budget_bytes=100, max_queue=1, queue_timeout=5, retry_after=7
+    )
+    blocker = controller.acquire(100)
+    waiter = threading.Thread(target=lambda: controller.acquire(100).release())
+    waiter.start()
+    wait_until(lambda: controller.stats()["queued"] == 1)
+
+    started = time.monotonic()
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.acquire(100)
+
+    assert time.monotonic() - started < 1
+    assert excinfo.value.retry_after == 7
+    assert controller.stats()["rejected"] == 1
+    blocker.release()
+    waiter.join(timeout=5)
+
+
+def test_wait_times_out():
+    controller = AdmissionController(budget_bytes=100, max_queue=2, queue_timeout=0.05)
+    blocker = controller.acquire(100)
+
+    with pytest.raises(AdmissionRejected):
+        controller.acquire(50)
+
+    stats = controller.stats()
+    assert stats["timed_out"] == 1
+    assert stats["queued"] == 0
+    blocker.release()
+
+
+def test_release_peak_keeps_only_retained_bytes():
+    controller = AdmissionController(budget_bytes=100)
+    reservation = controller.acquire(90, retained=20)
+
+    reservation.release_peak()
+    assert controller.stats()["in_use_bytes"] == 20
+    assert controller.stats()["active"] == 1
+
+    reservation.release()
+    reservation.release()
+    assert controller.stats()["in_use_bytes"] == 0
+    assert controller.stats()["active"] == 0
+
+
+def test_detached_reservation_outlives_the_original():
+    controller = AdmissionController(budget_bytes=100)
+    reservation = controller.acquire(40)
+
+    detached = reservation.detach()
+    reservation.release()
+    assert controller.stats()["in_use_bytes"] == 40
+
+    detached.release()
+    assert controller.stats()["in_use_bytes"] == 0
+    assert controller.stats()["active"] == 0
+
+
+def encoded_image(image_format, size):
+    buffer = io.BytesIO()
+    Image.new("RGB", size).save(buffer, image_format)
+    buffer.seek(0)
+    return buffer
+
+
+def test_jpeg_estimate_uses_the_reduced_decode():
+    source = encoded_image("JPEG", (4000, 2000))
+
+    unscaled, kept = decoded_pixels(source, 1000)
+
+    assert unscaled == kept == 1000 * 500
+    assert source.tell() == 0
+
+
+def test_jpeg_just_above_max_side_is_decoded_in_full():
+    unscaled, kept = decoded_pixels(encoded_image("JPEG", (1200, 600)), 1000)
+
+    assert unscaled == 1200 * 600
+    assert kept == 1000 * 500
+
+
+def test_non_jpeg_is_decoded_at_full_size():
+    unscaled, kept = decoded_pixels(encoded_image("PNG", (4000, 2000)), 1000)
+
+    assert unscaled == 4000 * 2000
+    assert kept == 1000 * 500
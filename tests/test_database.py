@@ -0,0 +1,67 @@
+import pytest
+from flask import Flask
+from sqlalchemy import inspect, text
+
+from prelovium.utils import database
+from prelovium.utils.database import add_missing_columns, db
+
+# The uploads table as created before the derivatives column existed
+OLD_UPLOADS_TABLE = """
+CREATE TABLE uploads (
+    id INTEGER PRIMARY KEY,
+    upload_id VARCHAR(100) NOT NULL UNIQUE,
+    title VARCHAR(200) NOT NULL,
+    created_at DATETIME
+)
+"""
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text(OLD_UPLOADS_TABLE))
+        yield app
+
+
+def column_names():
+    return {column["name"] for column in inspect(db.engine).get_columns("uploads")}
+
+
+def test_adds_missing_nullable_column(app):
+    add_missing_columns()
+
+    assert "derivatives" in column_names()
+
+
+def test_is_idempotent(app):
+    add_missing_columns()
+    add_missing_columns()
+
+    assert "derivatives" in column_names()
+
+
+def test_tolerates_column_added_concurrently(app, monkeypatch):
+    # Another instance adds the column between our inspection and the ALTER
+    stale_columns = inspect(db.engine).get_columns("uploads")
+    with db.engine.begin() as connection:
+        connection.execute(text("ALTER TABLE uploads ADD COLUMN derivatives TEXT"))
+
+    real_inspect = database.inspect
+    calls = []
+
+    def inspect_once_stale(engine):
+        inspector = real_inspect(engine)
+        if not calls:
+            calls.append(inspector)
+            monkeypatch.setattr(inspector, "get_columns", lambda name: stale_columns)
+        return inspector
+
+    monkeypatch.setattr(database, "inspect", inspect_once_stale)
+
+    add_missing_columns()
+
+    assert "derivatives" in column_names()
@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+from prelovium.utils.derivatives import (
+    build_derivatives,
+    content_type,
+    derivative_blob_name,
+    srcset,
+)
+
+
+def decode(encoded):
+    return cv2.imdecode(np.frombuffer(encoded, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_skips_widths_at_or_above_source_width():
+    image = np.zeros((300, 400, 3), dtype=np.uint8)
+
+    derivatives = build_derivatives(image, [800, 400, 200, 100], ["jpeg"])
+
+    assert [width for width, _, _ in derivatives] == [100, 200]
+
+
+def test_heights_keep_the_aspect_ratio():
+    image = np.zeros((300, 400, 3), dtype=np.uint8)
+
+    derivatives = build_derivatives(image, [200, 100], ["jpeg"])
+
+    heights = [decode(encoded).shape[0] for _, _, encoded in derivatives]
+    assert heights == [75, 150]
+
+
+def test_encodes_every_format_per_width():
+    image = np.zeros((300, 400, 3), dtype=np.uint8)
+
+    derivatives = build_derivatives(image, [100], ["webp", "jpeg"])
+
+    assert [(width, image_format) for width, image_format, _ in derivatives] == [
+        (100, "webp"),
+        (100, "jpeg"),
+    ]
+    assert derivatives[1][2][:2] == b"\xff\xd8"
+
+
+def test_blob_name_and_content_type():
+    assert (
+        derivative_blob_name("abc", "primary", 320, "webp")
+        == "processed/abc/primary_320w.webp"
+    )
+    assert content_type("jpeg") == "image/jpeg"
+
+
+def test_srcset_orders_widths_numerically():
+    urls = {"1200": "large.webp", "320": "small.webp", "800": "medium.webp"}
+
+    assert srcset(urls) == "small.webp 320w, medium.webp 800w, large.webp 1200w"
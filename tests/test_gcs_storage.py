@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+
+from google.api_core.exceptions import Forbidden, NotFound
+
+from prelovium.utils.gcs_storage import GCSStorage
+
+
+class FakeBlob:
+    def __init__(self, name, size=10, error=None):
+        self.name = name
+        self.size = size
+        self.error = error
+        self.deletes = 0
+
+    def delete(self):
+        self.deletes += 1
+        if self.error:
+            raise self.error
+
+
+class FakeClient:
+    def __init__(self, blobs):
+        self.blobs = blobs
+
+    @contextmanager
+    def batch(self):
+        # Like a real batch, raise on exit with the first failed sub-request
+        yield
+        failing = [blob for blob in self.blobs if blob.error]
+        if failing:
+            raise failing[0].error
+
+
+def make_storage(blobs):
+    gcs = GCSStorage.__new__(GCSStorage)
+    gcs.client = FakeClient(blobs)
+    return gcs
+
+
+def test_deletes_whole_batches():
+    blobs = [FakeBlob(f"processed/a/{i}.jpeg") for i in range(5)]
+
+    assert make_storage(blobs).delete_blobs(blobs, batch_size=2) == (5, 50)
+
+
+def test_blobs_already_gone_count_as_deleted():
+    blobs = [
+        FakeBlob("processed/a/primary.jpeg"),
+        FakeBlob("processed/a/secondary.jpeg", error=NotFound("gone")),
+        FakeBlob("processed/a/label.jpeg", error=Forbidden("denied")),
+    ]
+
+    deleted = make_storage(blobs).delete_blobs(blobs)
+
+    assert deleted == (2, 20)
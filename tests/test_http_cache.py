@@ -0,0 +1,101 @@
+import gzip
+
+import pytest
+from flask import Flask
+
+from prelovium.utils import http_cache
+from prelovium.utils.http_cache import CachedJSON, LRUCache, json_response
+
+ENCODINGS = [None, "gzip"] + (["br"] if http_cache.brotli is not None else [])
+
+
+def large_entry():
+    return CachedJSON([{"upload_id": str(i), "title": "x" * 40} for i in range(50)])
+
+
+app = Flask(__name__)
+ENTRY = large_entry()
+
+
+@app.route("/entry")
+def entry_view():
+    return json_response(ENTRY)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.get_or_create("a", lambda: "A")
+    cache.get_or_create("b", lambda: "B")
+    cache.get_or_create("a", lambda: "unused")
+    cache.get_or_create("c", lambda: "C")
+
+    assert cache.get_or_create("a", lambda: "rebuilt") == "A"
+    assert cache.get_or_create("b", lambda: "rebuilt") == "rebuilt"
+
+
+def test_none_is_not_cached():
+    cache = LRUCache()
+    cache.get_or_create("missing", lambda: None)
+
+    assert cache.get_or_create("missing", lambda: "found") == "found"
+
+
+def test_clear_during_build_discards_the_result():
+    cache = LRUCache()
+
+    def build():
+        cache.clear()
+        return "stale"
+
+    assert cache.get_or_create("key", build) == "stale"
+    assert cache.get_or_create("key", lambda: "fresh") == "fresh"
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(http_cache.time, "monotonic", lambda: now[0])
+    cache = LRUCache(ttl=30)
+    cache.get_or_create("key", lambda: "old")
+
+    now[0] += 29
+    assert cache.get_or_create("key", lambda: "unused") == "old"
+    now[0] += 2
+    assert cache.get_or_create("key", lambda: "new") == "new"
+
+
+def test_if_modified_since_alone_never_returns_304():
+    # Rows change after they are created, so only the ETag may validate
+    response = app.test_client().get(
+        "/entry", headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+    )
+
+    assert response.status_code == 200
+    assert "Last-Modified" not in response.headers
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_matching_etag_returns_304_for_each_encoding(encoding):
+    client = app.test_client()
+    headers = {"Accept-Encoding": encoding or "identity"}
+
+    response = client.get("/entry", headers=headers)
+    assert response.status_code == 200
+    assert response.headers.get("Content-Encoding") == encoding
+    assert "Accept-Encoding" in response.vary
+
+    headers["If-None-Match"] = response.headers["ETag"]
+    response = client.get("/entry", headers=headers)
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_etag_differs_per_encoding():
+    entry = large_entry()
+
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        compressed = json_response(entry)
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        uncompressed = json_response(entry, compress=False)
+
+    assert compressed.headers["ETag"] != uncompressed.headers["ETag"]
+    assert gzip.decompress(compressed.get_data()) == entry.body
@@ -0,0 +1,70 @@
+import io
+
+from PIL import Image, JpegImagePlugin
+
+from prelovium.utils.image_loading import (
+    DECODE_MAX_SIDE,
+    decoded_size,
+    draft_scale,
+    open_image,
+)
+
+
+def encoded_image(image_format, size):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 100, 50)).save(buffer, image_format)
+    buffer.seek(0)
+    return buffer
+
+
+def test_phone_photo_jpeg_decodes_reduced(monkeypatch):
+    decoded = []
+    original_draft = JpegImagePlugin.JpegImageFile.draft
+
+    def draft(image, mode, size):
+        result = original_draft(image, mode, size)
+        decoded.append(image.size)
+        return result
+
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", draft)
+
+    image = open_image(encoded_image("JPEG", (4032, 3024)))
+
+    # The size right after draft() is what the decoder materializes
+    assert decoded[0] == (2016, 1512)
+    assert image.size == (2016, 1512)
+    assert image.mode == "RGB"
+
+
+def test_large_jpeg_uses_a_deeper_reduction():
+    image = open_image(encoded_image("JPEG", (8064, 6048)))
+
+    assert image.size == (2016, 1512)
+
+
+def test_non_jpeg_is_downscaled_to_max_side():
+    image = open_image(encoded_image("PNG", (4032, 3024)))
+
+    assert image.size == (2048, 1536)
+
+
+def test_small_jpeg_is_not_reduced():
+    image = open_image(encoded_image("JPEG", (800, 600)))
+
+    assert image.size == (800, 600)
+
+
+def test_draft_scale_keeps_most_of_max_side():
+    assert draft_scale((2500, 1875), DECODE_MAX_SIDE) == 1
+    assert draft_scale((4032, 3024), DECODE_MAX_SIDE) == 2
+    assert draft_scale((6200, 4000), DECODE_MAX_SIDE) == 4
+    assert draft_scale((40000, 30000), DECODE_MAX_SIDE) == 8
+
+
+def test_decoded_size_matches_open_image():
+    source = encoded_image("JPEG", (4033, 3025))
+
+    expected = decoded_size("JPEG", (4033, 3025), DECODE_MAX_SIDE)
+
+    assert open_image(source).size == expected
+    assert decoded_size("PNG", (4033, 3025), DECODE_MAX_SIDE) == (4033, 3025)
@@ -0,0 +1,132 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from prelovium.utils.storage_gc import (
+    collect_garbage,
+    find_orphaned_blobs,
+    sweep_upload_folder,
+)
+
+
+class FakeBlob:
+    def __init__(self, name, age_seconds, size=10):
+        self.name = name
+        self.size = size
+        self.time_created = datetime.now(timezone.utc) - timedelta(seconds=age_seconds)
+
+
+class FakeGCS:
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.deleted = []
+
+    def list_blobs(self, prefix, page_size=1000):
+        return [blob for blob in self.blobs if blob.name.startswith(prefix)]
+
+    def delete_blobs(self, blobs):
+        self.deleted.extend(blobs)
+        return len(blobs), sum(blob.size for blob in blobs)
+
+
+def make_entry(path, age_seconds, is_dir=False):
+    if is_dir:
+        os.makedirs(path)
+        with open(os.path.join(path, "primary.jpeg"), "wb") as f:
+            f.write(b"x" * 5)
+    else:
+        with open(path, "wb") as f:
+            f.write(b"x" * 3)
+    mtime = time.time() - age_seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_sweep_upload_folder_removes_only_entries_past_cutoff(tmp_path):
+    make_entry(tmp_path / "old", 7200, is_dir=True)
+    make_entry(tmp_path / "old.jpeg", 7200)
+    make_entry(tmp_path / "fresh", 60, is_dir=True)
+
+    report = sweep_upload_folder(str(tmp_path), max_age_seconds=3600)
+
+    assert report == {"removed": 2, "bytes": 8}
+    assert sorted(os.listdir(tmp_path)) == ["fresh"]
+
+
+def test_sweep_upload_folder_dry_run_keeps_files(tmp_path):
+    make_entry(tmp_path / "old", 7200, is_dir=True)
+
+    report = sweep_upload_folder(str(tmp_path), max_age_seconds=3600, dry_run=True)
+
+    assert report == {"removed": 1, "bytes": 5}
+    assert os.listdir(tmp_path) == ["old"]
+
+
+def test_sweep_upload_folder_missing_directory(tmp_path):
+    assert sweep_upload_folder(str(tmp_path / "missing"), 3600) == {
+        "removed": 0,
+        "bytes": 0,
+    }
+
+
+def test_find_orphaned_blobs_respects_grace_window():
+    gcs = FakeGCS(
+        [
+            FakeBlob("originals/known/primary.jpeg", 7200),
+            FakeBlob("processed/gone/primary.jpeg", 7200),
+            FakeBlob("processed/gone/primary_320w.webp", 7200),
+            FakeBlob("originals/in-flight/primary.jpeg", 60),
+            FakeBlob("processed/stray.jpeg", 7200),
+        ]
+    )
+
+    orphans = find_orphaned_blobs(gcs, {"known"}, grace_seconds=3600)
+
+    assert [blob.name for blob in orphans] == [
+        "processed/gone/primary.jpeg",
+        "processed/gone/primary_320w.webp",
+    ]
+
+
+def test_collect_garbage_dry_run_deletes_nothing(tmp_path):
+    gcs = FakeGCS([FakeBlob("processed/gone/primary.jpeg", 7200, size=40)])
+    make_entry(tmp_path / "old", 7200, is_dir=True)
+
+    report = collect_garbage(
+        gcs, str(tmp_path), {"known"}, "postgresql", 3600, 3600, dry_run=True
+    )
+
+    assert report["orphaned_blobs"] == {"removed": 1, "bytes": 40}
+    assert report["reclaimed_bytes"] == 45
+    assert gcs.deleted == []
+    assert os.listdir(tmp_path) == ["old"]
+
+
+def test_orphan_pass_refuses_an_empty_database(tmp_path):
+    gcs = FakeGCS([FakeBlob("processed/other-instance/primary.jpeg", 7200)])
+
+    report = collect_garbage(gcs, str(tmp_path), set(), "postgresql", 3600, 3600)
+
+    assert report["orphaned_blobs"]["removed"] == 0
+    assert "empty" in report["orphaned_blobs"]["skipped"]
+    assert gcs.deleted == []
+
+
+def test_orphan_pass_refuses_sqlite(tmp_path):
+    gcs = FakeGCS([FakeBlob("processed/other-instance/primary.jpeg", 7200)])
+
+    report = collect_garbage(gcs, str(tmp_path), {"known"}, "sqlite", 3600, 3600)
+
+    assert "SQLite" in report["orphaned_blobs"]["skipped"]
+    assert gcs.deleted == []
+
+
+def test_force_runs_the_orphan_pass_anyway(tmp_path):
+    blob = FakeBlob("processed/gone/primary.jpeg", 7200)
+    gcs = FakeGCS([blob])
+
+    report = collect_garbage(
+        gcs, str(tmp_path), set(), "sqlite", 3600, 3600, force=True
+    )
+
+    assert report["orphaned_blobs"] == {"removed": 1, "bytes": 10}
+    assert gcs.deleted == [blob]